@@ -1,3 +1,3 @@
-from .schema import User, Present, UserData, PresentWishData, PresentGiftData, PresentCreateData
+from .schema import User, Present, UserData, PresentWishData, PresentCreateData
 from .store import Store, FileStore
 from .service import Service, StoreService
@@ -1,9 +1,23 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import Optional, List
+from typing import Any, Dict, Optional, Set
 
+from pydantic import BaseModel, conint, validator
 
-@dataclass
+JsonInt = conint(ge=-2 ** 63, le=2 ** 64 - 1)
+
+
+def _check_utf8(value: Optional[str]) -> Optional[str]:
+    """Reject strings that cannot be encoded as UTF-8, such as strings holding lone surrogates."""
+    if value is not None:
+        try:
+            value.encode("utf-8")
+        except UnicodeEncodeError:
+            raise ValueError("must be valid UTF-8 text")
+    return value
+
+
+@dataclass(slots=True)
 class User:
     """An user of the application"""
     name: str
@@ -12,14 +26,25 @@ class User:
     present_id: int
 
     def to_user_data(self) -> UserData:
-        return UserData(
-            name=self.name,
-            alias=self.alias,
-            icon=self.icon,
-        )
+        return UserData(**self.to_user_data_dict())
+
+    def to_user_data_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "alias": self.alias,
+            "icon": self.icon,
+        }
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "alias": self.alias,
+            "icon": self.icon,
+            "present_id": self.present_id,
+        }
 
-@dataclass
+
+@dataclass(slots=True)
 class Present:
     """A present item with all data"""
     id: int
@@ -28,32 +53,45 @@ class Present:
     link: Optional[str] = None
     price: Optional[int] = None
     favourite: bool = False
-    assigned_to: List[str] = field(default_factory=list)
-
-    def to_present_wish_response(self) -> PresentWishData:
-        return PresentWishData(
-            id=self.id,
-            title=self.title,
-            description=self.description,
-            link=self.link,
-            price=self.price,
-            favourite=self.favourite,
-        )
-
-    def to_present_gift_response(self) -> PresentGiftData:
-        return PresentGiftData(
-            id=self.id,
-            title=self.title,
-            description=self.description,
-            link=self.link,
-            price=self.price,
-            favourite=self.favourite,
-            assigned_to=self.assigned_to,
+    assigned_to: Set[str] = field(default_factory=set)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> Present:
+        return cls(
+            id=data["id"],
+            title=data["title"],
+            description=data.get("description", ""),
+            link=data.get("link"),
+            price=data.get("price"),
+            favourite=data.get("favourite", False),
+            assigned_to=set(data.get("assigned_to", [])),
         )
 
-
-@dataclass
-class UserData:
+    def to_wish_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "link": self.link,
+            "price": self.price,
+            "favourite": self.favourite,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "link": self.link,
+            "price": self.price,
+            "favourite": self.favourite,
+            "assigned_to": sorted(self.assigned_to),
+        }
+
+    to_gift_dict = to_dict
+
+
+class UserData(BaseModel):
     """User data as returned by the API."""
     name: str
     alias: str
@@ -68,16 +106,17 @@ class UserData:
         )
 
 
-@dataclass
-class PresentCreateData:
+class PresentCreateData(BaseModel):
     """Present data as returned by the API for present creation."""
     title: str
     description: str = ""
     link: Optional[str] = None
-    price: Optional[int] = None
+    price: Optional[JsonInt] = None
     favourite: bool = False
 
-    def to_present(self, id: int, assigned_to: List[str]) -> Present:
+    _check_utf8 = validator("title", "description", "link", allow_reuse=True)(_check_utf8)
+
+    def to_present(self, id: int, assigned_to: Set[str]) -> Present:
         return Present(
             id=id,
             title=self.title,
@@ -89,40 +128,18 @@ class PresentCreateData:
         )
 
 
-@dataclass
-class PresentWishData:
+class PresentWishData(BaseModel):
     """Present data as returned by the API for wisher users."""
-    id: int
+    id: JsonInt
     title: str
     description: str = ""
     link: Optional[str] = None
-    price: Optional[int] = None
+    price: Optional[JsonInt] = None
     favourite: bool = False
 
-    def to_present(self, assigned_to: List[str]) -> Present:
-        return Present(
-            id=self.id,
-            title=self.title,
-            description=self.description,
-            link=self.link,
-            price=self.price,
-            favourite=self.favourite,
-            assigned_to=assigned_to,
-        )
-
-
-@dataclass
-class PresentGiftData:
-    """Present data as returned by the API for gifter users."""
-    id: int
-    title: str
-    description: str = ""
-    link: Optional[str] = None
-    price: Optional[int] = None
-    favourite: bool = False
-    assigned_to: List[str] = field(default_factory=list)
+    _check_utf8 = validator("title", "description", "link", allow_reuse=True)(_check_utf8)
 
-    def to_present(self) -> Present:
+    def to_present(self, assigned_to: Set[str]) -> Present:
         return Present(
             id=self.id,
             title=self.title,
@@ -130,5 +147,5 @@ class PresentGiftData:
             link=self.link,
             price=self.price,
             favourite=self.favourite,
-            assigned_to=self.assigned_to,
+            assigned_to=assigned_to,
         )
@@ -1,15 +1,16 @@
 import http
-from typing import List
-from fastapi import HTTPException
+from typing import Any, Dict, List, Optional, Tuple
+import orjson
+from fastapi import HTTPException, Response
 
-from .schema import Present, UserData, PresentWishData, PresentGiftData, PresentCreateData
+from .schema import Present, UserData, PresentWishData, PresentCreateData
 from .store import Store
 
 
 class Service:
     """Interface for the service of the application."""
 
-    def get_all_users(self) -> List[UserData]:
+    def get_all_users(self) -> List[Dict[str, Any]]:
         """
         Retrieves all user data from the service.
         :return: The data of all the retrieved users.
@@ -24,67 +25,67 @@ class Service:
         """
         raise NotImplementedError()
 
-    def get_user_present_wish_list(self, user: str) -> List[PresentWishData]:
+    def get_user_present_wish_list(self, user: str) -> Response:
         """
         Retrieve the present list of an user.
         :param user: The name of the user of the present list.
-        :return: The present list of the user as expected by wishers.
+        :return: A JSON response with the present list of the user as expected by wishers.
         """
         raise NotImplementedError()
 
-    def get_user_present_gift_list(self, user: str) -> List[PresentGiftData]:
+    def get_user_present_gift_list(self, user: str) -> Response:
         """
         Retrieve the present list of an user.
         :param user: The name of the user of the present list.
-        :return: The present list of the user as expected by gifters.
+        :return: A JSON response with the present list of the user as expected by gifters.
         """
         raise NotImplementedError()
 
-    def create_present(self, user: str, present: PresentCreateData) -> List[PresentWishData]:
+    def create_present(self, user: str, present: PresentCreateData) -> Response:
         """
         Creates a present and saves it.
         :param user: The name of the user of the present list.
         :param present: The present data of the new present.
-        :return: The new present list for the user.
+        :return: A JSON response with the new present list of the user as expected by wishers.
         """
         raise NotImplementedError()
 
-    def update_present(self, user: str, present_id: int, present: PresentWishData) -> List[PresentWishData]:
+    def update_present(self, user: str, present_id: int, present: PresentWishData) -> Response:
         """
         Updates a present.
         :param user: The name of the user of the present list.
         :param present_id: The id of the present to update.
         :param present: The present data of the new present.
-        :return: The new present list for the user.
+        :return: A JSON response with the new present list of the user as expected by wishers.
         """
         raise NotImplementedError()
 
-    def delete_present(self, user: str, present_id: int) -> List[PresentWishData]:
+    def delete_present(self, user: str, present_id: int) -> Response:
         """
         Deletes a present.
         :param user: The name of the user of the present list.
         :param present_id: The id of the present to delete.
-        :return: The new present list for the user.
+        :return: A JSON response with the new present list of the user as expected by wishers.
         """
         raise NotImplementedError()
 
-    def assign_user_to_present(self, user: str, present_id: int, gifter: str) -> List[PresentGiftData]:
+    def assign_user_to_present(self, user: str, present_id: int, gifter: str) -> Response:
         """
         Assigns an user as a gifter for a present of another user.
         :param user: The name of the user of the present list.
         :param present_id: The id of the present to assign the gifter.
         :param gifter: The name of the gifter user.
-        :return: The new present list for the gifter user.
+        :return: A JSON response with the new present list of the user as expected by gifters.
         """
         raise NotImplementedError()
 
-    def remove_user_from_present(self, user: str, present_id: int, gifter: str) -> List[PresentGiftData]:
+    def remove_user_from_present(self, user: str, present_id: int, gifter: str) -> Response:
         """
         Removes an user as a gifter for a present of another user.
         :param user: The name of the user of the present list.
         :param present_id: The id of the present to assign the gifter.
         :param gifter: The name of the gifter user.
-        :return: The new present list for the gifter user.
+        :return: A JSON response with the new present list of the user as expected by gifters.
         """
         raise NotImplementedError()
 
@@ -94,9 +95,17 @@ class StoreService(Service):
 
     def __init__(self, store: Store):
         self._store = store
-
-    def get_all_users(self) -> List[UserData]:
-        return [user.to_user_data() for user in self._store.get_users()]
+        self._users_data_cache: Optional[List[Dict[str, Any]]] = None
+        self._users_data_cache_version: Optional[int] = None
+        self._wish_cache: Dict[str, Tuple[int, bytes]] = {}
+        self._gift_cache: Dict[str, Tuple[int, bytes]] = {}
+
+    def get_all_users(self) -> List[Dict[str, Any]]:
+        users_version = self._store.get_users_version()
+        if self._users_data_cache is None or self._users_data_cache_version != users_version:
+            self._users_data_cache = [user.to_user_data_dict() for user in self._store.get_users()]
+            self._users_data_cache_version = users_version
+        return self._users_data_cache
 
     def get_user_data(self, user: str) -> UserData:
         store_user = self._store.get_user(user)
@@ -104,54 +113,64 @@ class StoreService(Service):
             raise HTTPException(detail=f"No user with name \"{user}\"", status_code=http.HTTPStatus.NOT_FOUND)
         return store_user.to_user_data()
 
-    def get_user_present_wish_list(self, user: str) -> List[PresentWishData]:
-        store_presents = self._store.get_presents(user)
-        if store_presents is None:
-            raise HTTPException(detail=f"No user with name \"{user}\"", status_code=http.HTTPStatus.NOT_FOUND)
-        return [present.to_present_wish_response() for present in store_presents]
-
-    def get_user_present_gift_list(self, user: str) -> List[PresentGiftData]:
-        store_presents = self._store.get_presents(user)
-        if store_presents is None:
-            raise HTTPException(detail=f"No user with name \"{user}\"", status_code=http.HTTPStatus.NOT_FOUND)
-        return [present.to_present_gift_response() for present in store_presents]
-
-    def create_present(self, user: str, present: PresentCreateData) -> List[PresentWishData]:
+    def get_user_present_wish_list(self, user: str) -> Response:
+        presents_version = self._store.get_presents_version(user)
+        cached_version, content = self._wish_cache.get(user, (None, None))
+        if cached_version != presents_version:
+            store_presents = self._store.get_presents(user)
+            if store_presents is None:
+                raise HTTPException(detail=f"No user with name \"{user}\"", status_code=http.HTTPStatus.NOT_FOUND)
+            content = orjson.dumps([present.to_wish_dict() for present in store_presents])
+            self._wish_cache[user] = (presents_version, content)
+        return Response(content=content, media_type="application/json")
+
+    def get_user_present_gift_list(self, user: str) -> Response:
+        presents_version = self._store.get_presents_version(user)
+        cached_version, content = self._gift_cache.get(user, (None, None))
+        if cached_version != presents_version:
+            store_presents = self._store.get_presents(user)
+            if store_presents is None:
+                raise HTTPException(detail=f"No user with name \"{user}\"", status_code=http.HTTPStatus.NOT_FOUND)
+            content = orjson.dumps([present.to_gift_dict() for present in store_presents])
+            self._gift_cache[user] = (presents_version, content)
+        return Response(content=content, media_type="application/json")
+
+    def create_present(self, user: str, present: PresentCreateData) -> Response:
         wish_user = self._store.get_user(user)
         present_id = wish_user.present_id
         wish_user.present_id = present_id + 1
         self._store.upsert_user(wish_user)
 
         presents = self._store.get_presents(user)
-        presents.append(present.to_present(present_id, assigned_to=[]))
+        presents.append(present.to_present(present_id, assigned_to=set()))
         self._store.upsert_presents(user, presents)
-        return [present.to_present_wish_response() for present in presents]
+        return self.get_user_present_wish_list(user)
 
-    def update_present(self, user: str, present_id: int, present: PresentWishData) -> List[PresentWishData]:
+    def update_present(self, user: str, present_id: int, present: PresentWishData) -> Response:
         presents, found_present, found_present_index = self.find_present_in_list_by_id(user, present_id)
         presents[found_present_index] = present.to_present(found_present.assigned_to)
         self._store.upsert_presents(user, presents)
-        return [present.to_present_wish_response() for present in presents]
+        return self.get_user_present_wish_list(user)
 
-    def delete_present(self, user: str, present_id: int) -> List[PresentWishData]:
+    def delete_present(self, user: str, present_id: int) -> Response:
         presents, found_present, found_present_index = self.find_present_in_list_by_id(user, present_id)
         del presents[found_present_index]
         self._store.upsert_presents(user, presents)
-        return [present.to_present_wish_response() for present in presents]
+        return self.get_user_present_wish_list(user)
 
-    def assign_user_to_present(self, user: str, present_id: int, gifter: str) -> List[PresentGiftData]:
+    def assign_user_to_present(self, user: str, present_id: int, gifter: str) -> Response:
         presents, found_present, found_present_index = self.find_present_in_list_by_id(user, present_id)
-        if gifter not in presents[found_present_index].assigned_to:
-            presents[found_present_index].assigned_to.append(gifter)
+        if gifter not in found_present.assigned_to:
+            found_present.assigned_to.add(gifter)
             self._store.upsert_presents(user, presents)
-        return [present.to_present_gift_response() for present in presents]
+        return self.get_user_present_gift_list(user)
 
-    def remove_user_from_present(self, user: str, present_id: int, gifter: str) -> List[PresentGiftData]:
+    def remove_user_from_present(self, user: str, present_id: int, gifter: str) -> Response:
         presents, found_present, found_present_index = self.find_present_in_list_by_id(user, present_id)
-        if gifter in presents[found_present_index].assigned_to:
-            presents[found_present_index].assigned_to.remove(gifter)
+        if gifter in found_present.assigned_to:
+            found_present.assigned_to.discard(gifter)
             self._store.upsert_presents(user, presents)
-        return [present.to_present_gift_response() for present in presents]
+        return self.get_user_present_gift_list(user)
 
     def find_present_in_list_by_id(self, user: str, present_id: int) -> (List[Present], Present, int):
         """
@@ -160,8 +179,8 @@ class StoreService(Service):
         :param present_id: The id of the present to find.
         :return: The list of presents, the found present, and its index.
         """
-        presents = self._store.get_presents(user)
-        found_present = next(filter(lambda p: p.id == present_id, presents), None)
-        if found_present is None:
+        found_present_index = self._store.get_present_index(user, present_id)
+        if found_present_index is None:
             raise HTTPException(detail=f"No present with id \"{present_id}\" for user \"{user}\"", status_code=http.HTTPStatus.NOT_FOUND)
-        return presents, found_present, presents.index(found_present)
+        presents = self._store.get_presents(user)
+        return presents, presents[found_present_index], found_present_index
@@ -1,13 +1,31 @@
-import os.path
-from dataclasses import asdict
-from typing import List, Dict, Optional
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Callable, List, Dict, Optional, Set, Tuple
 
+import orjson
 import yaml
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 from .schema import User, Present
 
-USERS_FILE = "users.yml"
-PRESENTS_FILE = "presents.yml"
+USERS_FILE = "users.json"
+PRESENTS_DIR = "presents"
+PRESENTS_FILE_EXTENSION = ".json"
+LEGACY_USERS_FILE = "users.yml"
+LEGACY_PRESENTS_FILE = "presents.json"
+LEGACY_YAML_PRESENTS_FILE = "presents.yml"
+MIN_RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 60.0
+
+logger = logging.getLogger(__name__)
 
 
 class Store:
@@ -20,6 +38,13 @@ class Store:
         """
         raise NotImplementedError()
 
+    def get_users_version(self) -> int:
+        """
+        Retrieve the version of the users, which changes every time an user is created, updated or deleted.
+        :return: The current version of the users.
+        """
+        raise NotImplementedError()
+
     def get_user(self, name: str) -> Optional[User]:
         """
         Retrieve user data by name.
@@ -30,14 +55,14 @@ class Store:
 
     def upsert_user(self, user: User) -> None:
         """
-        Create or update an user. Will persist changes.
+        Create or update an user. Changes are persisted on the next flush.
         :param user: The user to update or create.
         """
         raise NotImplementedError()
 
     def delete_user(self, name: str) -> None:
         """
-        Delete an user. Will persist changes. Will do nothing if user does not exist.
+        Delete an user. Changes are persisted on the next flush. Will do nothing if user does not exist.
         :param name: The name of the user to delete.
         :raises ApplicationError: If user does not exist.
         """
@@ -51,9 +76,27 @@ class Store:
         """
         raise NotImplementedError()
 
+    def get_presents_version(self, name: str) -> int:
+        """
+        Retrieve the version of the present list of an user, which changes every time the list is upserted or deleted.
+        Changes made to a retrieved present list are not reflected in the version until the list is upserted.
+        :param name: The name of the user of the present list.
+        :return: The current version of the present list of the user.
+        """
+        raise NotImplementedError()
+
+    def get_present_index(self, name: str, present_id: int) -> Optional[int]:
+        """
+        Retrieve the position of a present in the present list of an user.
+        :param name: The name of the user of the present list.
+        :param present_id: The id of the present to find.
+        :return: The index of the present in the present list of the user. None if not found.
+        """
+        raise NotImplementedError()
+
     def upsert_presents(self, name: str, presents: List[Present]) -> None:
         """
-        Create or update an user. Will persist changes.
+        Create or update an user. Changes are persisted on the next flush.
         :param name: The name of the user of the present list.
         :param presents: The present list of the user to update or insert.
         """
@@ -61,73 +104,325 @@ class Store:
 
     def delete_presents(self, name: str) -> None:
         """
-        Delete an user. Will persist changes. Will do nothing if user does not have a present list.
+        Delete an user. Changes are persisted on the next flush. Will do nothing if user does not have a present list.
         :param name: The name of the user of the present list to delete.
         """
         raise NotImplementedError()
 
+    def flush(self) -> None:
+        """
+        Persist all pending changes.
+        """
+        raise NotImplementedError()
+
 
 class FileStore(Store):
-    """A simple store capable of loading and saving data to a file."""
+    """A simple store capable of loading and saving data to files. Each user's present list is kept in its own file."""
 
     def __init__(self, base_path: str):
         """
-        Initialize a store and load the users and presents stored.
+        Initialize a store and load the users stored. Present lists are loaded when first accessed.
         :param base_path: The base path to the saved data files.
         """
         self._base_path: str = base_path
+        self._users_path: str = os.path.join(base_path, USERS_FILE)
+        self._presents_path: str = os.path.join(base_path, PRESENTS_DIR)
         self._users: Dict[str, User] = {}
         self._presents: Dict[str, List[Present]] = {}
+        self._present_index: Dict[str, Dict[int, int]] = {}
+        self._unloaded_presents: Set[str] = set()
+        self._users_version: int = 0
+        self._presents_versions: Dict[str, int] = {}
+        self._users_dirty: bool = False
+        self._dirty_presents: Set[str] = set()
+        self._writer: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1)
+        self._queued_writes: List[Tuple[Future, str, Callable[[], None]]] = []
+        self._save_failures: Dict[str, Tuple[int, float]] = {}
         self._load_users()
         self._load_presents()
 
     def get_users(self) -> List[User]:
-        return [user for _, user in self._users.items()]
+        return list(self._users.values())
+
+    def get_users_version(self) -> int:
+        return self._users_version
 
     def get_user(self, name: str) -> Optional[User]:
-        return self._users[name] if name in self._users else None
+        return self._users.get(name)
 
     def upsert_user(self, user: User) -> None:
         self._users[user.name] = user
-        self._save_users()
+        self._users_version += 1
+        self._users_dirty = True
 
     def delete_user(self, name: str) -> None:
         if name in self._users:
             del self._users[name]
-            self._save_users()
+            self._users_version += 1
+            self._users_dirty = True
 
     def get_presents(self, name: str) -> Optional[List[Present]]:
-        return self._presents[name] if name in self._presents else None
+        if name in self._unloaded_presents:
+            self._load_user_presents(name)
+        return self._presents.get(name)
+
+    def get_presents_version(self, name: str) -> int:
+        return self._presents_versions.get(name, 0)
+
+    def get_present_index(self, name: str, present_id: int) -> Optional[int]:
+        presents = self.get_presents(name)
+        if presents is None:
+            return None
+        index = self._present_index[name].get(present_id)
+        if index is None or index >= len(presents) or presents[index].id != present_id:
+            self._index_presents(name)
+            index = self._present_index[name].get(present_id)
+        return index
 
     def upsert_presents(self, name: str, presents: List[Present]) -> None:
-        self._presents[name] = presents
-        self._save_presents()
+        self._check_presents_name(name)
+        if presents is self._presents.get(name):
+            present_index = self._present_index[name]
+            for index in range(len(present_index), len(presents)):
+                present_index[presents[index].id] = index
+        else:
+            self._presents[name] = presents
+            self._unloaded_presents.discard(name)
+            self._index_presents(name)
+        self._presents_versions[name] = self._presents_versions.get(name, 0) + 1
+        self._dirty_presents.add(name)
 
     def delete_presents(self, name: str) -> None:
-        if name in self._presents:
-            del self._presents[name]
-            self._save_presents()
+        if name in self._presents or name in self._unloaded_presents:
+            self._presents.pop(name, None)
+            self._present_index.pop(name, None)
+            self._unloaded_presents.discard(name)
+            self._presents_versions[name] = self._presents_versions.get(name, 0) + 1
+            self._dirty_presents.add(name)
+
+    def flush(self) -> None:
+        self._save_pending(retry_failed=True)
+        wait([write for write, _, _ in self._queued_writes])
+        self._check_writes()
+
+    async def run_flush_loop(self, interval: float) -> None:
+        """
+        Periodically persist pending changes, so bursts of mutations result in a single write. Runs until cancelled.
+        Files are written by a worker thread, so disk writes do not block the event loop.
+        Failed saves are logged and retried after a delay that grows with every consecutive failure.
+        :param interval: The time in seconds between flushes.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self._save_pending()
+                if self._queued_writes:
+                    await loop.run_in_executor(None, wait, [write for write, _, _ in self._queued_writes])
+                self._check_writes()
+            except Exception:
+                logger.exception("Unexpected error while flushing the store")
 
     def _load_users(self) -> None:
         """Utility method to load the users from the users file. Should not be called directly."""
-        with open(os.path.join(self._base_path, USERS_FILE), "r", encoding="utf-8") as user_file:
-            raw_users = yaml.safe_load(user_file)
+        self._migrate_legacy_file(os.path.join(self._base_path, LEGACY_USERS_FILE), self._users_path)
+        with open(self._users_path, "rb") as user_file:
+            raw_users = orjson.loads(user_file.read())
             self._users = {name: User(**user) for name, user in raw_users["users"].items()}
 
-    def _save_users(self) -> None:
-        """Utility method to save the users to the users file. Should not be called directly."""
-        with open(os.path.join(self._base_path, USERS_FILE), "w", encoding="utf-8") as user_file:
-            users = {name: asdict(user) for name, user in self._users.items()}
-            yaml.safe_dump({"users": users}, user_file, allow_unicode=True)
+    def _save_users(self) -> Future:
+        """Utility method to queue the users to be saved to the users file. Should not be called directly."""
+        users = {name: user.to_dict() for name, user in self._users.items()}
+        return self._writer.submit(self._write_file, self._users_path, orjson.dumps({"users": users}))
 
     def _load_presents(self) -> None:
-        """Utility method to load the presents from the presents file. Should not be called directly."""
-        with open(os.path.join(self._base_path, PRESENTS_FILE), "r", encoding="utf-8") as presents_file:
-            raw_presents = yaml.safe_load(presents_file)
-            self._presents = {name: [Present(**present) for present in present_list] for name, present_list in raw_presents["presents"].items()}
-
-    def _save_presents(self) -> None:
-        """Utility method to save the presents to the presents file. Should not be called directly."""
-        with open(os.path.join(self._base_path, PRESENTS_FILE), "w", encoding="utf-8") as presents_file:
-            presents = {name: [asdict(present) for present in present_list] for name, present_list in self._presents.items()}
-            yaml.safe_dump({"presents": presents}, presents_file, allow_unicode=True)
+        """
+        Utility method to find the present lists stored in the presents directory. Should not be called directly.
+        The present lists themselves are loaded when first accessed.
+        """
+        if not os.path.isdir(self._presents_path):
+            self._migrate_legacy_presents()
+        file_names = (os.path.splitext(file_name) for file_name in os.listdir(self._presents_path))
+        self._unloaded_presents = {name for name, extension in file_names if extension == PRESENTS_FILE_EXTENSION}
+
+    def _load_user_presents(self, name: str) -> None:
+        """
+        Utility method to load the presents of an user from its presents file. Should not be called directly.
+        The file is read on the calling thread, so the first access to a present list blocks the event loop for that read.
+        :param name: The name of the user of the present list.
+        """
+        with open(self._get_presents_path(name), "rb") as presents_file:
+            self._presents[name] = [Present.from_dict(present) for present in orjson.loads(presents_file.read())]
+        self._unloaded_presents.discard(name)
+        self._index_presents(name)
+
+    def _save_presents(self, name: str) -> Future:
+        """
+        Utility method to queue the presents of an user to be saved to its presents file. Should not be called directly.
+        The file is removed if the user no longer has a present list.
+        :param name: The name of the user of the present list.
+        :return: The queued write.
+        """
+        path = self._get_presents_path(name)
+        presents = self._presents.get(name)
+        if presents is None:
+            return self._writer.submit(self._remove_file, path)
+        return self._writer.submit(self._write_file, path, orjson.dumps([present.to_dict() for present in presents]))
+
+    def _get_presents_path(self, name: str) -> str:
+        """
+        Utility method to get the path to the presents file of an user. Should not be called directly.
+        :param name: The name of the user of the present list.
+        :return: The path to the presents file.
+        :raises ValueError: If the name cannot be used as a file name.
+        """
+        self._check_presents_name(name)
+        return os.path.join(self._presents_path, f"{name}{PRESENTS_FILE_EXTENSION}")
+
+    def _check_presents_name(self, name: str) -> None:
+        """
+        Utility method to check that an user name can name its presents file. Should not be called directly.
+        Names with path separators or that refer to a directory would place the file outside the presents directory.
+        :param name: The name of the user of the present list.
+        :raises ValueError: If the name cannot be used as a file name.
+        """
+        if name in ("", ".", "..") or os.path.basename(name) != name or "\0" in name:
+            raise ValueError(f"Invalid user name for a present list: \"{name}\"")
+
+    def _save_pending(self, retry_failed: bool = False) -> None:
+        """
+        Utility method to queue the saves of all data with pending changes. Should not be called directly.
+        Data is encoded in the calling thread and written by the writer thread in the order it was queued.
+        Each write is kept with a callback that marks its data as pending again if the write fails.
+        Data stays pending if it cannot be encoded, without affecting the saves of other data.
+        :param retry_failed: Whether to save data whose previous save failed before its retry delay has passed.
+        """
+        if self._users_dirty and self._should_save(self._users_path, retry_failed):
+            try:
+                write = self._save_users()
+            except Exception as error:
+                self._record_save_failure(self._users_path, error)
+            else:
+                self._users_dirty = False
+                self._queued_writes.append((write, self._users_path, self._mark_users_dirty))
+        for name in list(self._dirty_presents):
+            path = self._get_presents_path(name)
+            if not self._should_save(path, retry_failed):
+                continue
+            try:
+                write = self._save_presents(name)
+            except Exception as error:
+                self._record_save_failure(path, error)
+                continue
+            self._dirty_presents.discard(name)
+            self._queued_writes.append((write, path, partial(self._mark_presents_dirty, name)))
+
+    def _check_writes(self) -> None:
+        """
+        Utility method to collect the finished writes. Should not be called directly.
+        Failed writes are logged and their data is marked as pending, so a later flush retries them.
+        """
+        queued_writes = []
+        for write, path, mark_dirty in self._queued_writes:
+            if not write.done():
+                queued_writes.append((write, path, mark_dirty))
+            elif write.exception() is not None:
+                self._record_save_failure(path, write.exception())
+                mark_dirty()
+            else:
+                self._save_failures.pop(path, None)
+        self._queued_writes = queued_writes
+
+    def _should_save(self, path: str, retry_failed: bool) -> bool:
+        """
+        Utility method to check if a data file can be saved, given its previous failures. Should not be called directly.
+        :param path: The path to the data file.
+        :param retry_failed: Whether to ignore the retry delay of a previously failed save.
+        :return: True if the file has not failed to save, its retry delay has passed, or failures are retried anyway.
+        """
+        save_failure = self._save_failures.get(path)
+        return retry_failed or save_failure is None or save_failure[1] <= time.monotonic()
+
+    def _record_save_failure(self, path: str, error: BaseException) -> None:
+        """
+        Utility method to log a failed save and delay its retry. Should not be called directly.
+        The retry delay doubles with every consecutive failure, up to a maximum, which also limits the logged errors.
+        :param path: The path to the data file that could not be saved.
+        :param error: The error that made the save fail.
+        """
+        failures = self._save_failures.get(path, (0, 0.0))[0] + 1
+        retry_delay = min(MIN_RETRY_DELAY * 2 ** min(failures - 1, 16), MAX_RETRY_DELAY)
+        self._save_failures[path] = (failures, time.monotonic() + retry_delay)
+        logger.error("Could not save %s (%d consecutive failures), retrying in %g seconds", path, failures, retry_delay, exc_info=error)
+
+    def _mark_users_dirty(self) -> None:
+        """Utility method to mark the users as pending to be saved. Should not be called directly."""
+        self._users_dirty = True
+
+    def _mark_presents_dirty(self, name: str) -> None:
+        """
+        Utility method to mark the presents of an user as pending to be saved. Should not be called directly.
+        :param name: The name of the user of the present list.
+        """
+        self._dirty_presents.add(name)
+
+    def _index_presents(self, name: str) -> None:
+        """
+        Utility method to rebuild the present id index of an user. Should not be called directly.
+        Upserts only index appended presents, so the index may hold stale positions after presents are removed or replaced.
+        Lookups check the position they find and rebuild the index when it does not match.
+        :param name: The name of the user of the present list.
+        """
+        self._present_index[name] = {present.id: index for index, present in enumerate(self._presents[name])}
+
+    def _migrate_legacy_file(self, legacy_path: str, path: str) -> None:
+        """
+        Utility method to convert a legacy YAML data file to JSON. Should not be called directly.
+        Does nothing if the JSON file already exists or there is no legacy file to convert.
+        :param legacy_path: The path to the legacy YAML file.
+        :param path: The path to the JSON file that replaces it.
+        """
+        if os.path.exists(path) or not os.path.exists(legacy_path):
+            return
+        with open(legacy_path, "r", encoding="utf-8") as legacy_data_file:
+            data = yaml.load(legacy_data_file, Loader=SafeLoader)
+        self._write_file(path, orjson.dumps(data))
+
+    def _migrate_legacy_presents(self) -> None:
+        """
+        Utility method to split a legacy presents file, holding all present lists, into one file per user. Should not be called directly.
+        The files are written to a temporary directory that is moved into place once complete.
+        """
+        legacy_path = os.path.join(self._base_path, LEGACY_PRESENTS_FILE)
+        self._migrate_legacy_file(os.path.join(self._base_path, LEGACY_YAML_PRESENTS_FILE), legacy_path)
+        tmp_presents_path = f"{self._presents_path}.tmp"
+        os.makedirs(tmp_presents_path, exist_ok=True)
+        if os.path.exists(legacy_path):
+            with open(legacy_path, "rb") as legacy_presents_file:
+                raw_presents = orjson.loads(legacy_presents_file.read())
+            for name, present_list in raw_presents["presents"].items():
+                self._check_presents_name(name)
+                self._write_file(os.path.join(tmp_presents_path, f"{name}{PRESENTS_FILE_EXTENSION}"), orjson.dumps(present_list))
+        os.replace(tmp_presents_path, self._presents_path)
+
+    def _write_file(self, path: str, content: bytes) -> None:
+        """
+        Utility method to atomically replace a data file. Should not be called directly.
+        The content is written to a temporary file first, so a crash never leaves a partially written data file.
+        :param path: The path to the data file to write.
+        :param content: The full content of the file.
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as tmp_file:
+            tmp_file.write(content)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, path)
+
+    def _remove_file(self, path: str) -> None:
+        """
+        Utility method to remove a data file. Should not be called directly. Will do nothing if the file does not exist.
+        :param path: The path to the data file to remove.
+        """
+        if os.path.exists(path):
+            os.remove(path)
@@ -1 +1,2 @@
 data_path = "../data"
+flush_interval = 0.1
@@ -1,20 +1,42 @@
+import asyncio
+import logging
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from config import *
 from aregalo import FileStore, PresentCreateData, PresentWishData, StoreService
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"])
+logger = logging.getLogger(__name__)
 store = FileStore(data_path)
 service = StoreService(store)
 
 
+@app.on_event("startup")
+async def start_store_flush():
+    app.state.store_flush_task = asyncio.create_task(store.run_flush_loop(flush_interval))
+
+
+@app.on_event("shutdown")
+async def stop_store_flush():
+    app.state.store_flush_task.cancel()
+    try:
+        await app.state.store_flush_task
+    except asyncio.CancelledError:
+        pass
+    except Exception:
+        logger.exception("The store flush task failed")
+    store.flush()
+
+
 @app.get("/_status")
 async def status():
     return {"status": "ok"}
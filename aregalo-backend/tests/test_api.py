@@ -0,0 +1,82 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+import orjson
+
+import config
+
+_tmp_dir = None
+main = None
+
+
+def setUpModule():
+    global _tmp_dir, main
+    _tmp_dir = tempfile.TemporaryDirectory()
+    with open(os.path.join(_tmp_dir.name, "users.json"), "wb") as users_file:
+        users_file.write(orjson.dumps({"users": {"pepe": {"name": "pepe", "alias": "Pepe", "icon": "ducky.jpg", "present_id": 1}}}))
+    os.makedirs(os.path.join(_tmp_dir.name, "presents"))
+    with open(os.path.join(_tmp_dir.name, "presents", "pepe.json"), "wb") as presents_file:
+        presents_file.write(orjson.dumps([{"id": 1, "title": "Tren"}]))
+    config.data_path = _tmp_dir.name
+    import main as main_module
+    main = main_module
+
+
+def tearDownModule():
+    _tmp_dir.cleanup()
+
+
+def request(method, path, body=b""):
+    """Send a single request to the application and return its status code."""
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status_codes = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status_codes.append(message["status"])
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json")],
+        "server": ("testserver", 80),
+        "client": ("testclient", 50000),
+    }
+    asyncio.run(main.app(scope, receive, send))
+    return status_codes[0]
+
+
+class PresentApiTest(unittest.TestCase):
+    """Tests for the validation of present data sent to the API."""
+
+    def test_rejects_prices_that_cannot_be_stored(self):
+        self.assertEqual(request("POST", "/aregalo/pepe/presents", b'{"title": "Big", "price": 100000000000000000000}'), 422)
+        self.assertEqual(request("PUT", "/aregalo/pepe/presents/1", b'{"id": 1, "title": "Big", "price": 100000000000000000000}'), 422)
+
+    def test_rejects_ids_that_cannot_be_stored(self):
+        self.assertEqual(request("PUT", "/aregalo/pepe/presents/1", b'{"id": 100000000000000000000, "title": "Big"}'), 422)
+
+    def test_rejects_text_that_is_not_utf8(self):
+        self.assertEqual(request("POST", "/aregalo/pepe/presents", b'{"title": "\\ud800"}'), 422)
+        self.assertEqual(request("PUT", "/aregalo/pepe/presents/1", b'{"id": 1, "title": "Tren", "description": "\\ud800"}'), 422)
+
+    def test_keeps_present_list_readable(self):
+        request("POST", "/aregalo/pepe/presents", b'{"title": "Big", "price": 100000000000000000000}')
+        self.assertEqual(request("GET", "/aregalo/pepe/presents"), 200)
+        self.assertEqual(main.store.get_presents("pepe")[0].title, "Tren")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import http
+import os
+import tempfile
+import unittest
+
+import orjson
+from fastapi import HTTPException
+
+from aregalo import FileStore, Present, StoreService, User
+
+
+class StoreServiceTest(unittest.TestCase):
+    """Tests for the cached responses of the store service."""
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        base_path = self._tmp_dir.name
+        with open(os.path.join(base_path, "users.json"), "wb") as users_file:
+            users_file.write(orjson.dumps({"users": {"pepe": {"name": "pepe", "alias": "Pepe", "icon": "ducky.jpg", "present_id": 2}}}))
+        os.makedirs(os.path.join(base_path, "presents"))
+        with open(os.path.join(base_path, "presents", "pepe.json"), "wb") as presents_file:
+            presents_file.write(orjson.dumps([{"id": 1, "title": "Tren", "assigned_to": ["mama"]}]))
+        self.store = FileStore(base_path)
+        self.service = StoreService(self.store)
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def assert_not_found(self, get_present_list, user):
+        with self.assertRaises(HTTPException) as context:
+            get_present_list(user)
+        self.assertEqual(context.exception.status_code, http.HTTPStatus.NOT_FOUND)
+
+    def test_present_lists_follow_direct_store_upserts(self):
+        self.assertEqual(orjson.loads(self.service.get_user_present_wish_list("pepe").body)[0]["title"], "Tren")
+        self.assertEqual(orjson.loads(self.service.get_user_present_gift_list("pepe").body)[0]["assigned_to"], ["mama"])
+
+        self.store.upsert_presents("pepe", [Present(id=1, title="Coche", assigned_to={"papa"})])
+
+        self.assertEqual(orjson.loads(self.service.get_user_present_wish_list("pepe").body)[0]["title"], "Coche")
+        self.assertEqual(orjson.loads(self.service.get_user_present_gift_list("pepe").body)[0]["assigned_to"], ["papa"])
+
+    def test_present_lists_follow_direct_store_deletes(self):
+        self.service.get_user_present_wish_list("pepe")
+        self.service.get_user_present_gift_list("pepe")
+
+        self.store.delete_presents("pepe")
+
+        self.assert_not_found(self.service.get_user_present_wish_list, "pepe")
+        self.assert_not_found(self.service.get_user_present_gift_list, "pepe")
+
+    def test_present_lists_follow_service_changes(self):
+        self.service.get_user_present_gift_list("pepe")
+
+        self.service.assign_user_to_present("pepe", 1, "papa")
+
+        self.assertEqual(orjson.loads(self.service.get_user_present_gift_list("pepe").body)[0]["assigned_to"], ["mama", "papa"])
+
+    def test_unknown_user_is_not_cached(self):
+        self.assert_not_found(self.service.get_user_present_wish_list, "maria")
+        self.assert_not_found(self.service.get_user_present_gift_list, "maria")
+
+        self.store.upsert_presents("maria", [Present(id=1, title="Libro")])
+
+        self.assertEqual(orjson.loads(self.service.get_user_present_wish_list("maria").body)[0]["title"], "Libro")
+        self.assertEqual(orjson.loads(self.service.get_user_present_gift_list("maria").body)[0]["title"], "Libro")
+
+    def test_users_follow_store_changes(self):
+        self.assertEqual([user["name"] for user in self.service.get_all_users()], ["pepe"])
+
+        self.store.upsert_user(User(name="maria", alias="María", icon="horse.jpg", present_id=1))
+        self.assertEqual([user["name"] for user in self.service.get_all_users()], ["pepe", "maria"])
+
+        self.store.delete_user("pepe")
+        self.assertEqual([user["name"] for user in self.service.get_all_users()], ["maria"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+import orjson
+import yaml
+
+from aregalo import FileStore, Present, User
+
+
+class FileStoreTest(unittest.TestCase):
+    """Tests for the persistence of the file store."""
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.base_path = self._tmp_dir.name
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def write_data(self, users, presents):
+        with open(os.path.join(self.base_path, "users.json"), "wb") as users_file:
+            users_file.write(orjson.dumps({"users": users}))
+        os.makedirs(os.path.join(self.base_path, "presents"))
+        for name, present_list in presents.items():
+            with open(os.path.join(self.base_path, "presents", f"{name}.json"), "wb") as presents_file:
+                presents_file.write(orjson.dumps(present_list))
+
+    def read_presents_file(self, name):
+        with open(os.path.join(self.base_path, "presents", f"{name}.json"), "rb") as presents_file:
+            return orjson.loads(presents_file.read())
+
+    def test_migrates_legacy_yaml_files(self):
+        with open(os.path.join(self.base_path, "users.yml"), "w", encoding="utf-8") as users_file:
+            yaml.safe_dump({"users": {"mama": {"name": "mama", "alias": "Mamá", "icon": "leaf.jpg", "present_id": 2}}}, users_file, allow_unicode=True)
+        with open(os.path.join(self.base_path, "presents.yml"), "w", encoding="utf-8") as presents_file:
+            yaml.safe_dump({"presents": {"mama": [{"id": 1, "title": "Libro", "assigned_to": ["papa"]}], "papa": []}}, presents_file)
+
+        store = FileStore(self.base_path)
+
+        self.assertEqual(store.get_user("mama"), User(name="mama", alias="Mamá", icon="leaf.jpg", present_id=2))
+        self.assertEqual(store.get_presents("mama"), [Present(id=1, title="Libro", assigned_to={"papa"})])
+        self.assertEqual(store.get_presents("papa"), [])
+        self.assertTrue(os.path.exists(os.path.join(self.base_path, "users.json")))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.base_path, "presents"))), ["mama.json", "papa.json"])
+
+    def test_splits_legacy_presents_file(self):
+        self.write_data({}, {})
+        os.rmdir(os.path.join(self.base_path, "presents"))
+        with open(os.path.join(self.base_path, "presents.json"), "wb") as presents_file:
+            presents_file.write(orjson.dumps({"presents": {"pepe": [{"id": 3, "title": "Tren"}]}}))
+
+        store = FileStore(self.base_path)
+
+        self.assertEqual(store.get_presents("pepe"), [Present(id=3, title="Tren")])
+        self.assertEqual(self.read_presents_file("pepe")[0]["title"], "Tren")
+
+    def test_flush_persists_changes(self):
+        self.write_data({"pepe": {"name": "pepe", "alias": "Pepe", "icon": "ducky.jpg", "present_id": 1}}, {"pepe": []})
+        store = FileStore(self.base_path)
+
+        store.upsert_user(User(name="pepe", alias="Pepe", icon="ducky.jpg", present_id=2))
+        store.upsert_presents("pepe", [Present(id=1, title="Tren", assigned_to={"papa", "mama"})])
+        store.flush()
+
+        reloaded_store = FileStore(self.base_path)
+        self.assertEqual(reloaded_store.get_user("pepe").present_id, 2)
+        self.assertEqual(reloaded_store.get_presents("pepe"), [Present(id=1, title="Tren", assigned_to={"mama", "papa"})])
+        self.assertEqual(self.read_presents_file("pepe")[0]["assigned_to"], ["mama", "papa"])
+
+    def test_flush_removes_deleted_presents(self):
+        self.write_data({}, {"pepe": [], "papa": []})
+        store = FileStore(self.base_path)
+
+        store.delete_presents("papa")
+        store.flush()
+
+        self.assertIsNone(store.get_presents("papa"))
+        self.assertEqual(os.listdir(os.path.join(self.base_path, "presents")), ["pepe.json"])
+        self.assertIsNone(FileStore(self.base_path).get_presents("papa"))
+
+    def test_upsert_replaces_presents_not_yet_loaded(self):
+        self.write_data({}, {"pepe": [{"id": 1, "title": "Tren"}], "papa": [{"id": 2, "title": "Libro"}]})
+        store = FileStore(self.base_path)
+
+        store.upsert_presents("pepe", [Present(id=5, title="Coche")])
+        store.flush()
+
+        self.assertEqual(store.get_presents("pepe"), [Present(id=5, title="Coche")])
+        self.assertEqual(store.get_presents("papa"), [Present(id=2, title="Libro")])
+        self.assertEqual(FileStore(self.base_path).get_presents("pepe"), [Present(id=5, title="Coche")])
+
+    def test_failed_write_is_retried_on_next_flush(self):
+        self.write_data({}, {"pepe": []})
+        store = FileStore(self.base_path)
+        write_file = store._write_file
+        failures = [OSError("disk full")]
+
+        def failing_write_file(path, content):
+            if failures:
+                raise failures.pop()
+            write_file(path, content)
+
+        store._write_file = failing_write_file
+        store.upsert_presents("pepe", [Present(id=1, title="Tren")])
+        with self.assertLogs("aregalo.store", level="ERROR"):
+            store.flush()
+        self.assertEqual(self.read_presents_file("pepe"), [])
+
+        store.flush()
+        self.assertEqual(self.read_presents_file("pepe")[0]["title"], "Tren")
+
+    def test_unencodable_presents_do_not_block_other_saves(self):
+        self.write_data({}, {"pepe": [], "maria": []})
+        store = FileStore(self.base_path)
+
+        store.upsert_presents("pepe", [Present(id=1, title="Tren", price=10 ** 20)])
+        store.upsert_presents("maria", [Present(id=2, title="Libro")])
+        with self.assertLogs("aregalo.store", level="ERROR"):
+            store.flush()
+
+        self.assertEqual(self.read_presents_file("pepe"), [])
+        self.assertEqual(self.read_presents_file("maria")[0]["title"], "Libro")
+
+        store.get_presents("pepe")[0].price = 10
+        store.upsert_presents("pepe", store.get_presents("pepe"))
+        store.flush()
+        self.assertEqual(self.read_presents_file("pepe")[0]["price"], 10)
+
+    def test_failed_save_is_delayed_by_flush_loop(self):
+        self.write_data({}, {"pepe": []})
+        store = FileStore(self.base_path)
+        store.upsert_presents("pepe", [Present(id=1, title="Tren", price=10 ** 20)])
+
+        async def run_flush_loop():
+            task = asyncio.create_task(store.run_flush_loop(0.01))
+            await asyncio.sleep(0.2)
+            self.assertFalse(task.done())
+            task.cancel()
+
+        with self.assertLogs("aregalo.store", level="ERROR") as logs:
+            asyncio.run(run_flush_loop())
+        self.assertEqual(len(logs.records), 1)
+
+    def test_present_index_follows_list_changes(self):
+        self.write_data({}, {"pepe": [{"id": 1, "title": "a"}, {"id": 2, "title": "b"}, {"id": 3, "title": "c"}]})
+        store = FileStore(self.base_path)
+
+        presents = store.get_presents("pepe")
+        del presents[0]
+        presents.append(Present(id=4, title="d"))
+        store.upsert_presents("pepe", presents)
+
+        self.assertEqual([store.get_present_index("pepe", present_id) for present_id in (1, 2, 3, 4)], [None, 0, 1, 2])
+        self.assertIsNone(store.get_present_index("nobody", 1))
+
+    def test_rejects_names_outside_presents_directory(self):
+        self.write_data({}, {})
+        store = FileStore(self.base_path)
+
+        for name in ("../users", "a/b", "..", ""):
+            with self.assertRaises(ValueError):
+                store.upsert_presents(name, [])
+        store.flush()
+        self.assertEqual(os.listdir(os.path.join(self.base_path, "presents")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()